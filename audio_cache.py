@@ -0,0 +1,154 @@
+import pygame
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from metrics import metrics
+
+# Decoded audio is stored here as raw PCM at the mixer's format
+AUDIO_CACHE_DIR = '.audio_cache'
+
+class AudioCache:
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR):
+        self.cache_dir = cache_dir
+        # (content key, volume) -> mixer-ready pygame Sound, shared by every user asking for that volume.
+        # Shared sounds are never given another volume, callers wanting one get a separate Sound
+        self.sounds = {}
+        self.hashes = {}  # path -> ((mtime, size), content hash), so lookups do not reread the file
+        self.refs = {}  # (content key, volume) -> number of LazySounds holding the shared Sound
+        # Characters are loaded by the kiosk preload thread while the main thread plays sounds
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(path):
+        """Hash the file contents so identical clips share one decoded sound"""
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def mixer_format():
+        """Return (frequency, size, channels) of the initialized mixer"""
+        return pygame.mixer.get_init()
+
+    def file_hash(self, path):
+        """Content hash of path, only recomputed when its mtime or size changes"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self.hashes.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, self.content_hash(path))
+            self.hashes[path] = cached
+        return cached[1]
+
+    def cache_key(self, path):
+        frequency, size, channels = self.mixer_format()
+        return f"{self.file_hash(path)}_{frequency}_{size}_{channels}"
+
+    def load(self, path, volume=0.5):
+        """Return (handle, Sound) for path at volume, using the in-memory and on-disk PCM caches.
+        The handle is given back to release(), it stays valid even if the file changes on disk"""
+        with self.lock:
+            return self._load(path, volume)
+
+    def _load(self, path, volume):
+        key = self.cache_key(path)
+        if (key, volume) in self.sounds:
+            metrics.inc('quiz_asset_cache_hits_total', labels={'cache': 'audio'})
+            self.refs[(key, volume)] += 1
+            return (key, volume), self.sounds[(key, volume)]
+
+        pcm_path = os.path.join(self.cache_dir, key + '.pcm')
+        if os.path.exists(pcm_path):
+            metrics.inc('quiz_asset_cache_hits_total', labels={'cache': 'audio'})
+            with open(pcm_path, 'rb') as f:
+                sound = pygame.mixer.Sound(buffer=f.read())
+        else:
+            metrics.inc('quiz_asset_cache_misses_total', labels={'cache': 'audio'})
+            print(f"Decoding sound: {path}")
+            start_time = time.time()
+            sound = pygame.mixer.Sound(path)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so a partial write is never picked up.
+            # Its name is unique, render workers and other processes may be writing the same key
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(sound.get_raw())
+            os.replace(tmp_path, pcm_path)
+            print(f"Sound decoded and cached in {time.time() - start_time:.2f} seconds")
+
+        sound.set_volume(volume)
+        self.sounds[(key, volume)] = sound
+        self.refs[(key, volume)] = 1
+        return (key, volume), sound
+
+    def release(self, handle):
+        """Drop one reference to a sound returned by load(), freeing the decoded audio once nobody holds it"""
+        with self.lock:
+            if handle not in self.refs:
+                return
+            self.refs[handle] -= 1
+            if self.refs[handle] <= 0:
+                del self.refs[handle]
+                del self.sounds[handle]
+
+# Create audio cache instance shared by common sounds and characters
+audio_cache = AudioCache()
+
+class LazySound:
+    """Sound that is only decoded (or read from the PCM cache) when first played"""
+    def __init__(self, path, volume=0.5, cache=None):
+        self.path = path
+        self.volume = volume
+        self.cache = cache or audio_cache
+        self.sound = None
+        self.handle = None  # Cache entry of the loaded sound, released on unload
+
+    @property
+    def loaded(self):
+        return self.sound is not None
+
+    def load(self):
+        if self.sound is None:
+            self.handle, self.sound = self.cache.load(self.path, self.volume)
+        return self.sound
+
+    def unload(self):
+        """Give the decoded audio back to the cache, it is loaded again on the next play"""
+        if self.sound is not None:
+            self.sound.stop()
+            self.sound = None
+            self.cache.release(self.handle)
+            self.handle = None
+
+    def play(self, *args, **kwargs):
+        return self.load().play(*args, **kwargs)
+
+    def stop(self):
+        # Nothing can be playing if the sound was never loaded
+        if self.sound is not None:
+            self.sound.stop()
+
+    def get_num_channels(self):
+        if self.sound is None:
+            return 0
+        return self.sound.get_num_channels()
+
+    def get_length(self):
+        return self.load().get_length()
+
+    def get_raw(self):
+        return self.load().get_raw()
+
+    def get_volume(self):
+        return self.volume
+
+    def set_volume(self, volume):
+        # The loaded Sound may be shared, switch to the one cached for the new volume instead
+        if self.sound is not None:
+            self.cache.release(self.handle)
+            self.handle, self.sound = self.cache.load(self.path, volume)
+        self.volume = volume
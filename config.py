@@ -16,4 +16,7 @@ CHOICE_RECTS = [
     (60, 210, 330, 75),
     (60, 315, 330, 75),
     (60, 420, 330, 75)
-] 
\ No newline at end of file
+] 
+# Intro and bye screen durations in milliseconds
+INTRO_DURATION = 4000
+OUTRO_DURATION = 6000
@@ -1,13 +1,72 @@
 import requests
+import bisect
 import html
 import json
 import os
 import random
+import queue
+import threading
 import time
+from collections import namedtuple
 from config import WINDOW_WIDTH, FONT_SIZE, FONT_PATH
+from metrics import metrics
+
+# One question of a compiled session, times in milliseconds from the session start
+TimelineEntry = namedtuple('TimelineEntry', ['index', 'start', 'reveal', 'end'])
+# Sound event of a compiled session: action is 'loop', 'play' or 'stop', sound is a common
+# sound name or 'voice:<name>' for a character voice line
+AudioCue = namedtuple('AudioCue', ['time', 'action', 'sound'])
+# Session state at a given timestamp
+TimelineState = namedtuple('TimelineState', ['index', 'question', 'show_answer', 'question_start', 'reveal_time', 'session_end'])
+
+class SessionTimeline:
+    """Immutable schedule of a session, compiled up front so any timestamp can be looked up directly"""
+    def __init__(self, questions, session_length, question_time, answer_time):
+        entries = []
+        t = 0
+        for i in range(len(questions)):
+            entries.append(TimelineEntry(i, t, t + question_time, t + question_time + answer_time))
+            t += question_time + answer_time
+            # The session ends with the first question that finishes past the session length
+            if t >= session_length:
+                break
+        self.questions = tuple(questions[:len(entries)])
+        self.entries = tuple(entries)
+        self.starts = tuple(entry.start for entry in self.entries)
+        self.duration = self.entries[-1].end if self.entries else 0
+
+        cues = []
+        for entry in self.entries:
+            choice_letter = chr(65 + self.questions[entry.index]["answer"])  # A, B, C, D
+            cues.append(AudioCue(entry.start, 'loop', 'timer'))
+            cues.append(AudioCue(entry.reveal, 'stop', 'timer'))
+            cues.append(AudioCue(entry.reveal, 'play', 'answer'))
+            cues.append(AudioCue(entry.reveal, 'play', f'voice:{choice_letter}'))
+        self.cues = tuple(cues)
+        self.cue_times = tuple(cue.time for cue in self.cues)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entry_index_at(self, t):
+        """Index of the question shown at t, or len(self) once the session is over"""
+        if t >= self.duration:
+            return len(self.entries)
+        return max(0, bisect.bisect_right(self.starts, t) - 1)
+
+    def state_at(self, t):
+        index = self.entry_index_at(t)
+        if index >= len(self.entries):
+            return TimelineState(index, None, False, self.duration, self.duration, True)
+        entry = self.entries[index]
+        return TimelineState(index, self.questions[index], t >= entry.reveal, entry.start, entry.reveal, False)
+
+    def cues_between(self, t0, t1):
+        """Audio cues with t0 <= time < t1"""
+        return self.cues[bisect.bisect_left(self.cue_times, t0):bisect.bisect_left(self.cue_times, t1)]
 
 class GameLogic:
-    def __init__(self, session_length=61000, question_time=9000, answer_time=2000):
+    def __init__(self, session_length=61000, question_time=9000, answer_time=2000, questions=None):
         print("Initializing GameLogic...")
         start_time = time.time()
         
@@ -27,8 +86,10 @@ class GameLogic:
                     print(f"Error loading used questions: {e}")
                     self.used_questions = set()
         
-        print("Fetching new questions from API...")
-        self.questions = self.fetch_questions()
+        if questions is None:
+            print("Fetching new questions from API...")
+            questions = self.fetch_questions()
+        self.questions = questions
         if not self.questions:
             raise Exception("No new questions available. Please clear used_questions.json if you want to repeat questions.")
         
@@ -39,6 +100,7 @@ class GameLogic:
         self.session_start_time = 0
         self.show_time = 0
         self.session_should_end = False
+        self.timeline = None
         
         end_time = time.time()
         print(f"GameLogic initialized in {end_time - start_time:.2f} seconds")
@@ -48,6 +110,7 @@ class GameLogic:
         start_time = time.time()
         
         API_URL = "https://opentdb.com/api.php?amount=6"
+        outcome = 'error'
         try:
             response = requests.get(API_URL)
             data = response.json()
@@ -80,11 +143,31 @@ class GameLogic:
                 })
             
             print(f"Processed {len(questions)} new questions")
+            outcome = 'success'
             return questions
             
         except Exception as e:
+            metrics.inc('quiz_api_fetch_errors_total')
             print(f"Error fetching questions: {e}")
             return []
+        finally:
+            # Failed requests are timed too, a slow timeout is worth seeing in the latency
+            metrics.observe('quiz_api_fetch_seconds', time.time() - start_time, labels={'outcome': outcome})
+
+    def reset(self, questions):
+        """Recycle this instance for a new session with a fresh set of questions"""
+        self.questions = questions
+        self.current_index = 0
+        self.show_answer = False
+        self.last_switch_time = 0
+        self.session_start_time = 0
+        self.show_time = 0
+        self.session_should_end = False
+        self.timeline = None
+
+    def compile_timeline(self):
+        """Compile the current questions into a seekable session timeline"""
+        return SessionTimeline(self.questions, self.session_length, self.question_time, self.answer_time)
 
     def start(self, now):
         self.last_switch_time = now
@@ -92,30 +175,28 @@ class GameLogic:
         self.show_answer = False
         self.current_index = 0
         self.session_should_end = False
+        self.timeline = self.compile_timeline()
+
+    def state_at(self, t):
+        """Session state t milliseconds after the start, without stepping through frames"""
+        return self.timeline.state_at(t)
 
     def update(self, now):
-        elapsed = now - self.last_switch_time
         session_elapsed = now - self.session_start_time
-        session_end = False
+        state = self.timeline.state_at(session_elapsed)
         question_end = False
-        if not self.session_should_end and session_elapsed >= self.session_length:
-            self.session_should_end = True
-        if not self.show_answer and elapsed >= self.question_time:
-            self.show_answer = True
-            self.show_time = now
-        if self.show_answer and now - self.show_time >= self.answer_time:
-            # Save used question
+        # Mark every question finished since the previous update as used
+        while self.current_index < state.index:
             self.used_questions.add(self.questions[self.current_index]["qid"])
             self.current_index += 1
-            if self.current_index >= len(self.questions):
-                session_end = True
-            elif self.session_should_end:
-                session_end = True
-            else:
-                self.last_switch_time = now
-                self.show_answer = False
             question_end = True
-        return session_end, question_end
+        self.session_should_end = session_elapsed >= self.session_length
+        if state.session_end:
+            return True, question_end
+        self.show_answer = state.show_answer
+        self.last_switch_time = self.session_start_time + state.question_start
+        self.show_time = self.session_start_time + state.reveal_time
+        return False, question_end
 
     def get_current(self):
         if self.current_index >= len(self.questions):
@@ -124,4 +205,49 @@ class GameLogic:
 
     def save_used(self):
         with open(self.USED_QUESTIONS_FILE, 'w') as f:
-            json.dump(list(self.used_questions), f) 
\ No newline at end of file
+            json.dump(list(self.used_questions), f) 
+
+class QuestionPrefetcher:
+    """Keep a queue of question batches filled in the background for upcoming sessions"""
+    def __init__(self, logic, depth=2, min_interval=5.0):
+        self.logic = logic
+        self.batches = queue.Queue(maxsize=depth)
+        self.min_interval = min_interval  # Open Trivia Database allows one request every 5 seconds
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def depth(self):
+        return self.batches.qsize()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            questions = self.logic.fetch_questions()
+            if questions:
+                while not self.stopped.is_set():
+                    try:
+                        self.batches.put(questions, timeout=0.5)
+                        metrics.set('quiz_question_bank_depth', self.depth())
+                        break
+                    except queue.Full:
+                        continue
+            self.stopped.wait(self.min_interval)
+
+    def get(self, timeout=None):
+        """Return the next batch, skipping questions used since it was fetched.
+        Returns None if no batch arrived within timeout seconds"""
+        while True:
+            try:
+                questions = self.batches.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            metrics.set('quiz_question_bank_depth', self.depth())
+            questions = [q for q in questions if q["qid"] not in self.logic.used_questions]
+            if questions:
+                return questions
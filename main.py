@@ -1,131 +1,270 @@
 import pygame
+import argparse
 import sys
 import time
-from logic import GameLogic
-from ui import render_game, character_manager, common_sounds
-
-print("Starting game initialization...")
-start_time = time.time()
-
-print("Initializing pygame...")
-pygame.init()
-pygame.mixer.init()  # Initialize the mixer for sound
-from config import WINDOW_WIDTH, WINDOW_HEIGHT
-
-print("Initializing character manager and common sounds...")
-# Initialize character manager and common sounds after pygame mixer
-character_manager.initialize()
-common_sounds.initialize()
-
-print("Creating game window...")
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.NOFRAME)
-pygame.display.set_caption("Mobile Game Window")
-
-print("Selecting random character...")
-# Select a random character for this session
-current_character = character_manager.select_random_character()
-
-print("Initializing game logic...")
-# Game logic
-logic = GameLogic()
-
-init_end_time = time.time()
-print(f"Game initialized in {init_end_time - start_time:.2f} seconds")
-
-# Show intro state
-print("Starting intro sequence...")
-game_state = 'intro'
-start_time = pygame.time.get_ticks()
-if current_character and 'intro' in current_character.voice_sounds:
-    current_character.voice_sounds['intro'].play()
-while pygame.time.get_ticks() - start_time < 4000:  # Show intro for 4 seconds
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                pygame.quit()
-                sys.exit()
-    render_game(screen, None, False, start_time, 0, game_state)
-    pygame.display.flip()
-    pygame.time.wait(16)  # Cap at ~60 FPS
+from logic import GameLogic, QuestionPrefetcher
+from ui import render_game, character_manager, common_sounds, scene_signature, FrameSkipper
+from config import INTRO_DURATION, OUTRO_DURATION
+from metrics import metrics, MetricsExporter
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Quiz game")
+    parser.add_argument('--kiosk', action='store_true',
+                        help="Loop sessions in one process instead of exiting after the first one")
+    parser.add_argument('--pool-size', type=int, default=2,
+                        help="Number of characters kept loaded in kiosk mode, the current one included (at least 2)")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Periodically write metrics to this file (.json for JSON, Prometheus textfile otherwise)")
+    parser.add_argument('--metrics-interval', type=float, default=15.0,
+                        help="Seconds between two metrics exports")
+    args = parser.parse_args()
+    if args.pool_size < 2:
+        parser.error("--pool-size must be at least 2: the current character and the one preloaded for the next session")
+    return args
 
-# Start the game after intro
-game_state = 'thinking'
-logic.start(pygame.time.get_ticks())
-# Select initial video for first question
-character_manager.select_random_video()
+# Frames whose scene did not change are neither drawn nor flipped
+frame_skipper = FrameSkipper()
 
-running = True
-while running:
-    now = pygame.time.get_ticks()
+# Frame rate of the question loop
+QUESTION_FPS = 60
+
+# Events after which the window content may be lost and must be drawn again
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
+
+def handle_events():
+    """Process pending events, return False if the player asked to quit"""
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
-            running = False
+            return False
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
-                running = False
-    session_end, question_end = logic.update(now)
-    
-    # If question ended, select a new random video for the next question
-    if question_end:
-        character_manager.select_random_video()
-        
-    current = logic.get_current()
-    if session_end or not current:
-        # Show bye state
-        game_state = 'bye'
-        if current_character and 'outro' in current_character.voice_sounds:
-            current_character.voice_sounds['outro'].play()
-        start_time = pygame.time.get_ticks()
-        while pygame.time.get_ticks() - start_time < 6000:  # Show bye for 6 seconds
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                    break
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        running = False
-                        break
-            if not running:
-                break
-            render_game(screen, None, False, start_time, 0, game_state)
-            pygame.display.flip()
-            pygame.time.wait(16)
-        running = False
-        break
-    q, show_answer, last_switch_time = current
-    
-    # Update game state based on show_answer
-    game_state = 'correct' if show_answer else 'thinking'
-    
-    # Control sounds
-    if show_answer:
-        if 'timer' in common_sounds.sounds:
-            common_sounds.stop('timer')
-        if 'answer' in common_sounds.sounds:
-            if not common_sounds.sounds['answer'].get_num_channels():
-                common_sounds.play('answer')
-                # Play the corresponding choice sound
-                correct_choice = q["answer"]
-                choice_letter = chr(65 + correct_choice)  # A, B, C, D
-                if current_character and choice_letter in current_character.voice_sounds:
-                    current_character.voice_sounds[choice_letter].play()
-    elif 'timer' in common_sounds.sounds:
-        if not common_sounds.sounds['timer'].get_num_channels():
-            common_sounds.play('timer')
-        
-    render_game(screen, q, show_answer, last_switch_time, logic.question_time, game_state)
+                return False
+        if event.type in EXPOSE_EVENTS:
+            frame_skipper.reset()
+    return True
+
+def draw_if_changed(screen, now, current, show_answer, last_switch_time, question_time, game_state):
+    """Draw and flip a frame unless its scene is unchanged since the last drawn one"""
+    signature = scene_signature(current, show_answer, last_switch_time, question_time, game_state, now)
+    if not frame_skipper.should_render(signature):
+        metrics.inc('quiz_frames_skipped_total')
+        return
+    start = time.perf_counter()
+    render_game(screen, current, show_answer, last_switch_time, question_time, game_state, now=now)
     pygame.display.flip()
+    metrics.observe('quiz_frame_seconds', time.perf_counter() - start)
+    metrics.inc('quiz_frames_rendered_total')
 
-# Stop all sounds when exiting
-if current_character:
-    for sound in current_character.voice_sounds.values():
-        sound.stop()
+def show_screen(screen, game_state, duration):
+    """Show the intro or bye screen for duration milliseconds"""
+    start_time = pygame.time.get_ticks()
+    while True:
+        now = pygame.time.get_ticks()
+        if now - start_time >= duration:
+            break
+        if not handle_events():
+            return False
+        draw_if_changed(screen, now, None, False, start_time, 0, game_state)
+        pygame.time.wait(16)  # Cap at ~60 FPS
+    return True
+
+def run_intro(screen, current_character):
+    print("Starting intro sequence...")
+    # A new session always starts with a freshly drawn screen
+    frame_skipper.reset()
+    if current_character and 'intro' in current_character.voice_sounds:
+        current_character.voice_sounds['intro'].play()
+    return show_screen(screen, 'intro', INTRO_DURATION)
+
+def report_frames():
+    print(f"Frames drawn: {frame_skipper.rendered}, unchanged frames skipped: {frame_skipper.skipped}")
+    frame_skipper.rendered = 0
+    frame_skipper.skipped = 0
+
+def run_questions(screen, logic, current_character):
+    """Play the question part of a session, return False if the player quit"""
+    logic.start(pygame.time.get_ticks())
+    # Select initial video for first question
+    character_manager.select_random_video()
+    clock = pygame.time.Clock()
+
+    while True:
+        now = pygame.time.get_ticks()
+        if not handle_events():
+            return False
+        session_end, question_end = logic.update(now)
+
+        # If question ended, select a new random video for the next question
+        if question_end:
+            character_manager.select_random_video()
+
+        current = logic.get_current()
+        if session_end or not current:
+            return True
+        q, show_answer, last_switch_time = current
+
+        # Update game state based on show_answer
+        game_state = 'correct' if show_answer else 'thinking'
+
+        # Control sounds
+        if show_answer:
+            if 'timer' in common_sounds.sounds:
+                common_sounds.stop('timer')
+            if 'answer' in common_sounds.sounds:
+                if not common_sounds.sounds['answer'].get_num_channels():
+                    common_sounds.play('answer')
+                    # Play the corresponding choice sound
+                    correct_choice = q["answer"]
+                    choice_letter = chr(65 + correct_choice)  # A, B, C, D
+                    if current_character and choice_letter in current_character.voice_sounds:
+                        current_character.voice_sounds[choice_letter].play()
+        elif 'timer' in common_sounds.sounds:
+            if not common_sounds.sounds['timer'].get_num_channels():
+                common_sounds.play('timer')
+
+        draw_if_changed(screen, now, q, show_answer, last_switch_time, logic.question_time, game_state)
+        clock.tick(QUESTION_FPS)
+
+def run_outro(screen, current_character):
+    if current_character and 'outro' in current_character.voice_sounds:
+        current_character.voice_sounds['outro'].play()
+    return show_screen(screen, 'bye', OUTRO_DURATION)
+
+def stop_sounds(current_character):
+    if current_character:
+        for sound in current_character.voice_sounds.values():
+            sound.stop()
     for sound in common_sounds.sounds.values():
         sound.stop()
-    
-logic.save_used()
-pygame.quit()
-sys.exit() 
\ No newline at end of file
+
+def run_single(screen, logic):
+    print("Selecting random character...")
+    # Select a random character for this session
+    current_character = character_manager.select_random_character()
+
+    running = run_intro(screen, current_character)
+    if running:
+        running = run_questions(screen, logic, current_character)
+    if running and run_outro(screen, current_character):
+        metrics.inc('quiz_videos_completed_total')
+    stop_sounds(current_character)
+    report_frames()
+
+# Seconds between two error messages while the kiosk waits on questions or a character
+WAIT_LOG_INTERVAL = 10
+
+def wait_for_preload():
+    """Wait for the background character load while handling events, return False if the player quit"""
+    start_time = time.time()
+    last_log = start_time
+    while not character_manager.preload_ready():
+        if not handle_events():
+            return False
+        if time.time() - last_log >= WAIT_LOG_INTERVAL:
+            print(f"Error: character {character_manager.preload_name} still loading after {time.time() - start_time:.0f} seconds")
+            last_log = time.time()
+        pygame.time.wait(16)
+    return True
+
+def wait_for_questions(prefetcher):
+    """Wait for the next question batch while handling events, return None if the player quit"""
+    start_time = time.time()
+    last_log = start_time
+    while True:
+        questions = prefetcher.get(timeout=0.1)
+        if questions:
+            return questions
+        if not handle_events():
+            return None
+        if time.time() - last_log >= WAIT_LOG_INTERVAL:
+            print(f"Error: no new questions after {time.time() - start_time:.0f} seconds, is the API reachable?")
+            last_log = time.time()
+
+def run_kiosk(screen, logic):
+    """Loop sessions in one process, keeping characters warm and questions prefetched"""
+    prefetcher = QuestionPrefetcher(logic).start()
+    next_name = character_manager.preload_character()
+    sessions = 0
+    switch_start = time.time()
+
+    running = True
+    while running:
+        if not wait_for_preload():
+            break
+        current_character = character_manager.activate(next_name) if next_name else None
+        if sessions > 0:
+            print("Waiting for prefetched questions...")
+            questions = wait_for_questions(prefetcher)
+            if questions is None:
+                break
+            logic.reset(questions)
+        switch_latency = (time.time() - switch_start) * 1000
+        print(f"Session {sessions + 1}: {next_name} ready in {switch_latency:.0f} ms "
+              f"(pool {character_manager.warm_count()}/{character_manager.max_warm}, "
+              f"hits {character_manager.pool_hits}, misses {character_manager.pool_misses}, "
+              f"question batches queued {prefetcher.depth()})")
+
+        running = run_intro(screen, current_character)
+        if running:
+            running = run_questions(screen, logic, current_character)
+        if running:
+            # Load the next character while the outro plays
+            next_name = character_manager.preload_character()
+            running = run_outro(screen, current_character)
+            if running:
+                metrics.inc('quiz_videos_completed_total')
+        stop_sounds(current_character)
+        report_frames()
+        logic.save_used()
+        sessions += 1
+        switch_start = time.time()
+
+    prefetcher.stop()
+    print(f"Kiosk stopped after {sessions} sessions")
+
+def main():
+    args = parse_args()
+
+    print("Starting game initialization...")
+    start_time = time.time()
+
+    print("Initializing pygame...")
+    pygame.init()
+    pygame.mixer.init()  # Initialize the mixer for sound
+    from config import WINDOW_WIDTH, WINDOW_HEIGHT
+
+    print("Initializing character manager and common sounds...")
+    # Initialize character manager and common sounds after pygame mixer
+    character_manager.max_warm = args.pool_size
+    character_manager.initialize()
+    common_sounds.initialize()
+
+    print("Creating game window...")
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.NOFRAME)
+    pygame.display.set_caption("Mobile Game Window")
+
+    print("Initializing game logic...")
+    # Game logic
+    logic = GameLogic()
+
+    init_end_time = time.time()
+    print(f"Game initialized in {init_end_time - start_time:.2f} seconds")
+
+    exporter = None
+    if args.metrics_file:
+        metrics.add_collector(character_manager.collect_metrics)
+        exporter = MetricsExporter(args.metrics_file, args.metrics_interval).start()
+
+    if args.kiosk:
+        run_kiosk(screen, logic)
+    else:
+        run_single(screen, logic)
+
+    if exporter:
+        exporter.stop()
+    logic.save_used()
+    pygame.quit()
+    sys.exit()
+
+if __name__ == '__main__':
+    main()
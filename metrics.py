@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+
+# Help text and type of every exported metric
+METRICS = {
+    'quiz_frames_rendered_total': ('counter', "Frames drawn by render_game"),
+    'quiz_frames_skipped_total': ('counter', "Frames skipped because the scene did not change"),
+    'quiz_frames_repeated_total': ('counter', "Unchanged frames written again to a rendered video without drawing"),
+    'quiz_frame_seconds': ('histogram', "Time to draw one frame"),
+    'quiz_effective_fps': ('gauge', "Frames drawn or repeated into a video per second since the previous export"),
+    'quiz_asset_cache_hits_total': ('counter', "Asset lookups served from a cache"),
+    'quiz_asset_cache_misses_total': ('counter', "Asset lookups that had to decode or load"),
+    'quiz_question_bank_depth': ('gauge', "Question batches prefetched and waiting for a session"),
+    'quiz_api_fetch_seconds': ('histogram', "Latency of question API requests, by outcome"),
+    'quiz_api_fetch_errors_total': ('counter', "Question API requests that failed"),
+    'quiz_character_resident_bytes': ('gauge', "Estimated memory held by a loaded character"),
+    'quiz_process_resident_bytes': ('gauge', "Resident memory of the process"),
+    'quiz_videos_completed_total': ('counter', "Sessions played or videos rendered to the end"),
+    'quiz_videos_per_hour': ('gauge', "Videos completed per hour since the process started"),
+    'quiz_uptime_seconds': ('gauge', "Seconds since the process started"),
+}
+
+# Histogram bucket upper bounds in seconds
+FRAME_BUCKETS = (0.002, 0.005, 0.01, 0.0167, 0.025, 0.0333, 0.05, 0.1, 0.25)
+API_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS = {
+    'quiz_frame_seconds': FRAME_BUCKETS,
+    'quiz_api_fetch_seconds': API_BUCKETS,
+}
+
+def label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.collectors = []  # Called before every export to refresh gauges
+
+    def inc(self, name, value=1, labels=None):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def remove(self, name, labels=None):
+        with self.lock:
+            self.gauges.pop((name, label_key(labels)), None)
+
+    def observe(self, name, value, labels=None):
+        buckets = BUCKETS[name]
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [0] * (len(buckets) + 2))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def counter_value(self, name):
+        """Sum of a counter over all its labels"""
+        with self.lock:
+            return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    def drain(self):
+        """Counters and histograms as plain data to be merged into another process's metrics.
+        They are cleared, so every update sent holds only what was counted since the previous one"""
+        with self.lock:
+            snapshot = {
+                'counters': list(self.counters.items()),
+                'histograms': [(key, list(values)) for key, values in self.histograms.items()],
+            }
+            self.counters.clear()
+            self.histograms.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        with self.lock:
+            for key, value in snapshot['counters']:
+                key = (key[0], tuple(tuple(label) for label in key[1]))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, values in snapshot['histograms']:
+                key = (key[0], tuple(tuple(label) for label in key[1]))
+                histogram = self.histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    histogram[i] += value
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+        uptime = time.time() - self.start_time
+        self.set('quiz_uptime_seconds', uptime)
+        self.set('quiz_videos_per_hour', self.counter_value('quiz_videos_completed_total') * 3600 / max(uptime, 1))
+        resident = process_resident_bytes()
+        if resident is not None:
+            self.set('quiz_process_resident_bytes', resident)
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        labels = list(labels) + list(extra)
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        with self.lock:
+            series = {}
+            for (name, labels), value in self.counters.items():
+                series.setdefault(name, []).append(f"{name}{self.format_labels(labels)} {value}")
+            for (name, labels), value in self.gauges.items():
+                series.setdefault(name, []).append(f"{name}{self.format_labels(labels)} {value}")
+            for (name, labels), values in self.histograms.items():
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(BUCKETS[name], values):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {values[-1]}")
+                lines.append(f"{name}_sum{self.format_labels(labels)} {values[-2]}")
+                lines.append(f"{name}_count{self.format_labels(labels)} {values[-1]}")
+        output = []
+        for name in sorted(series):
+            kind, description = METRICS.get(name, ('untyped', name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+    def to_json(self):
+        """Metrics as JSON, histogram buckets are cumulative like in the Prometheus format"""
+        with self.lock:
+            data = {'timestamp': time.time(), 'metrics': []}
+            for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+                data['metrics'].append({'name': name, 'labels': dict(labels), 'value': value})
+            for (name, labels), values in self.histograms.items():
+                buckets = {}
+                cumulative = 0
+                for bound, count in zip(BUCKETS[name], values):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                buckets['+Inf'] = values[-1]
+                data['metrics'].append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'buckets': buckets,
+                    'sum': values[-2],
+                    'count': values[-1],
+                })
+        return json.dumps(data, indent=2)
+
+def process_resident_bytes():
+    """Current resident memory of this process, None where it cannot be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class MetricsExporter:
+    """Periodically write the metrics to a file scraped by the node agent.
+    Files ending in .json get JSON, anything else the Prometheus textfile format"""
+    def __init__(self, path, interval=15.0, registry=None):
+        self.path = path
+        self.interval = interval
+        self.metrics = registry or metrics
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.last_export = time.time()
+        self.last_frames = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.export()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+
+    def export(self):
+        now = time.time()
+        # Skipped frames only count where they were written to a video, not when the window was left as is
+        frames = (self.metrics.counter_value('quiz_frames_rendered_total')
+                  + self.metrics.counter_value('quiz_frames_repeated_total'))
+        self.metrics.set('quiz_effective_fps', (frames - self.last_frames) / max(now - self.last_export, 1e-6))
+        self.last_export = now
+        self.last_frames = frames
+        self.metrics.collect()
+
+        content = self.metrics.to_json() if self.path.endswith('.json') else self.metrics.to_prometheus()
+        # Write then rename so the scraper never reads a partial file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+# Create metrics instance shared by the whole process
+metrics = Metrics()
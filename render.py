@@ -0,0 +1,525 @@
+import pygame
+import argparse
+import functools
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+import numpy as np
+from config import WINDOW_WIDTH, WINDOW_HEIGHT, INTRO_DURATION, OUTRO_DURATION
+from logic import GameLogic, SessionTimeline
+from metrics import metrics, MetricsExporter
+from ui import render_game, character_manager, common_sounds, Character, scaled, scene_signature, FrameSkipper
+from ui import video_frame_index
+
+# Offline render settings
+RENDER_FPS = 30
+FRAME_QUEUE_DEPTH = 8  # Frames waiting for the encoder before rendering blocks
+# Queued in place of a buffer to have the encoder write its previous frame again
+REPEAT_FRAME = 'repeat'
+# Draft previews render at a fraction of the window size and frame rate, upscaled by the encoder
+DRAFT_SCALE = 0.5
+DRAFT_FPS = 10
+# Seconds between two metrics updates sent by a worker to the parent process
+PROGRESS_INTERVAL = 1.0
+MIXER_FREQUENCY = 44100
+MIXER_SIZE = -16  # Signed 16-bit samples
+MIXER_CHANNELS = 2
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a quiz session to an MP4 file")
+    parser.add_argument('--output', default='quiz.mp4', help="Path of the rendered video")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes rendering chunks in parallel (drafts use none)")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for the character and pose choice")
+    parser.add_argument('--character', default=None, help="Character to use instead of a random one")
+    parser.add_argument('--fps', type=int, default=RENDER_FPS, help="Frame rate of the rendered video")
+    parser.add_argument('--draft', action='store_true',
+                        help="Cheap preview: reduced internal resolution and frame rate")
+    parser.add_argument('--draft-scale', type=float, default=DRAFT_SCALE,
+                        help="Internal resolution of draft renders, relative to the window size")
+    parser.add_argument('--draft-fps', type=int, default=DRAFT_FPS, help="Frame rate of draft renders")
+    parser.add_argument('--queue-depth', type=int, default=FRAME_QUEUE_DEPTH,
+                        help="Rendered frames buffered for the encoder of each worker")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Periodically write metrics to this file (.json for JSON, Prometheus textfile otherwise)")
+    parser.add_argument('--metrics-interval', type=float, default=15.0,
+                        help="Seconds between two metrics exports")
+    return parser.parse_args()
+
+def init_headless():
+    """Initialize pygame without a window or audio device"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    # pygame.init() opens the mixer, so its format has to be requested before
+    pygame.mixer.pre_init(frequency=MIXER_FREQUENCY, size=MIXER_SIZE, channels=MIXER_CHANNELS)
+    pygame.init()
+
+def video_duration(timeline):
+    """Length of the rendered video in milliseconds: intro, questions, then bye screen"""
+    return INTRO_DURATION + timeline.duration + OUTRO_DURATION
+
+def frame_time(frame, fps):
+    """Video time in milliseconds of a frame"""
+    return frame * 1000 // fps
+
+def first_frame_at(t, fps):
+    """Index of the first frame shown at or after video time t"""
+    return -(-t * fps // 1000)
+
+def scene_at(timeline, t, question_time):
+    """render_game arguments for the frame at video time t"""
+    if t < INTRO_DURATION:
+        return None, False, 0, 0, 'intro'
+    session_t = t - INTRO_DURATION
+    if session_t < timeline.duration:
+        state = timeline.state_at(session_t)
+        game_state = 'correct' if state.show_answer else 'thinking'
+        return state.question, state.show_answer, INTRO_DURATION + state.question_start, question_time, game_state
+    return None, False, INTRO_DURATION + timeline.duration, 0, 'bye'
+
+def chunk_frame_states(timeline, start, end, fps):
+    """Character frame sets (see ui.FRAME_STATES) shown by the frames start to end - 1"""
+    first, last = frame_time(start, fps), frame_time(end - 1, fps)
+    states = []
+    if first < INTRO_DURATION:
+        states.append('intro')
+    if first < INTRO_DURATION + timeline.duration and last >= INTRO_DURATION:
+        states.append('pose')
+    if last >= INTRO_DURATION + timeline.duration:
+        states.append('outro')
+    return tuple(states)
+
+# Character frame set drawn in each game state
+STATE_FRAMES = {'intro': 'intro', 'bye': 'outro', 'thinking': 'pose', 'correct': 'pose'}
+
+def chunk_frame_filter(timeline, start, end, fps, question_time):
+    """Build a Character frame_filter keeping only the video frames drawn by the frames start to end - 1"""
+    def frame_filter(frame_state, frame_count):
+        kept = set()
+        for frame in range(start, end):
+            t = frame_time(frame, fps)
+            _, _, last_switch_time, _, game_state = scene_at(timeline, t, question_time)
+            if STATE_FRAMES[game_state] == frame_state:
+                index = video_frame_index(game_state, t - last_switch_time, frame_count)
+                if index is not None:
+                    kept.add(index)
+        return kept
+    return frame_filter
+
+def split_chunks(timeline, fps, workers):
+    """Split the video into at most workers frame ranges, cutting only at question boundaries"""
+    total_frames = first_frame_at(video_duration(timeline), fps)
+    cuts = [INTRO_DURATION + entry.start for entry in timeline.entries]
+    cuts.append(INTRO_DURATION + timeline.duration)
+    boundaries = sorted(set(first_frame_at(t, fps) for t in cuts) - {0, total_frames})
+
+    # Pick the boundaries closest to an even split of the frames
+    chosen = set()
+    for k in range(1, workers):
+        if not boundaries:
+            break
+        ideal = k * total_frames / workers
+        chosen.add(min(boundaries, key=lambda b: abs(b - ideal)))
+    edges = [0] + sorted(chosen) + [total_frames]
+    return [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+
+def start_encoder(path, fps, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, draft=False):
+    """Start an ffmpeg process encoding raw RGB frames written to its stdin"""
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+        '-an'
+    ]
+    if (width, height) != (WINDOW_WIDTH, WINDOW_HEIGHT):
+        # Frames rendered at a lower resolution are only upscaled here, at output time
+        command += ['-vf', f'scale={WINDOW_WIDTH}:{WINDOW_HEIGHT}']
+    command += ['-c:v', 'libx264', '-preset', 'ultrafast' if draft else 'veryfast', '-crf', '18',
+                '-pix_fmt', 'yuv420p', path]
+    return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+class FrameBufferPool:
+    """Preallocated frame buffers handed between the render and encoder threads and reused"""
+    def __init__(self, count, width, height):
+        self.free = queue.Queue()
+        for _ in range(count):
+            self.free.put(np.empty((height, width, 3), dtype=np.uint8))
+
+    def acquire(self):
+        # Blocks when every buffer is still queued or being encoded
+        return self.free.get()
+
+    def release(self, buffer):
+        self.free.put(buffer)
+
+class FramePipeline:
+    """Overlap rendering with encoding: finished frames go through a bounded queue to an encoder thread"""
+    def __init__(self, encoder, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, depth=FRAME_QUEUE_DEPTH):
+        self.encoder = encoder
+        self.frames = queue.Queue(maxsize=depth)
+        # One buffer per queue slot, plus the ones being filled, written and kept for repeats
+        self.pool = FrameBufferPool(depth + 3, width, height)
+        self.last_buffer = None
+        self.thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.error = None
+        # Per-stage timings in seconds and queue depth samples
+        self.frame_count = 0
+        self.repeat_count = 0
+        self.render_time = 0.0
+        self.wait_time = 0.0
+        self.copy_time = 0.0
+        self.encode_time = 0.0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, surface, render_time=0.0):
+        """Copy a rendered surface into a pooled buffer and queue it for the encoder"""
+        if self.error:
+            raise self.error
+        start = time.perf_counter()
+        buffer = self.pool.acquire()
+        acquired = time.perf_counter()
+        # surfarray is indexed (x, y), the encoder expects rows
+        np.copyto(buffer, pygame.surfarray.pixels3d(surface).swapaxes(0, 1))
+        copied = time.perf_counter()
+        depth = self.frames.qsize()
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+        self.frames.put(buffer)
+        self.wait_time += acquired - start + time.perf_counter() - copied
+        self.copy_time += copied - acquired
+        self.render_time += render_time
+        self.frame_count += 1
+
+    def repeat(self):
+        """Queue the previous frame again without rendering or copying anything"""
+        if self.error:
+            raise self.error
+        self.frames.put(REPEAT_FRAME)
+        self.repeat_count += 1
+        self.frame_count += 1
+
+    def _encode_loop(self):
+        while True:
+            buffer = self.frames.get()
+            if buffer is None:
+                break
+            if buffer is REPEAT_FRAME:
+                buffer = self.last_buffer
+            elif self.last_buffer is not None:
+                # Keep the newest frame for repeats, the previous one can be reused
+                self.pool.release(self.last_buffer)
+            self.last_buffer = buffer
+            if self.error is None:
+                start = time.perf_counter()
+                try:
+                    self.encoder.stdin.write(buffer.data)
+                except Exception as e:
+                    # Keep draining so the render thread never blocks on a dead encoder
+                    self.error = e
+                self.encode_time += time.perf_counter() - start
+
+    def close(self):
+        """Flush the queued frames and wait for the encoder to finish"""
+        self.frames.put(None)
+        self.thread.join()
+        self.encoder.stdin.close()
+        returncode = self.encoder.wait()
+        if self.error:
+            raise self.error
+        return returncode
+
+    def stats(self):
+        frames = max(self.frame_count, 1)
+        rendered = max(self.frame_count - self.repeat_count, 1)
+        return {
+            'frames': self.frame_count,
+            'skipped': self.repeat_count,
+            'render_ms': self.render_time * 1000 / rendered,
+            'copy_ms': self.copy_time * 1000 / rendered,
+            'encode_ms': self.encode_time * 1000 / frames,
+            'wait_ms': self.wait_time * 1000 / frames,
+            'avg_queue_depth': self.depth_total / frames,
+            'max_queue_depth': self.max_depth,
+        }
+
+def render_chunk(job):
+    """Render one frame range of the session to its own segment file (runs in a worker process)"""
+    init_headless()
+    result = render_frames(job)
+    pygame.quit()
+    job['progress'].put(metrics.drain())
+    return result
+
+def render_frames(job):
+    """Render the frames of a job to job['path'], sending metrics to job['progress'] if it is set"""
+    random.seed(job['seed'])
+    start_time = time.time()
+    print(f"Chunk {job['index']}: rendering frames {job['start']}-{job['end']}")
+
+    render_scale = job['render_scale']
+    timeline = SessionTimeline(job['questions'], job['session_length'], job['question_time'], job['answer_time'])
+    if job['character']:
+        # Only decode the videos this frame range shows, and no sounds since workers never play any
+        frame_states = chunk_frame_states(timeline, job['start'], job['end'], job['fps'])
+        frame_filter = chunk_frame_filter(timeline, job['start'], job['end'], job['fps'], job['question_time'])
+        character_manager.current_character = Character(job['character'], pose=job['pose'], frame_states=frame_states,
+                                                        load_voices=False, frame_scale=render_scale,
+                                                        frame_filter=frame_filter)
+        character_manager.select_random_video()
+
+    width, height = scaled(WINDOW_WIDTH, render_scale), scaled(WINDOW_HEIGHT, render_scale)
+    screen = pygame.Surface((width, height))
+    encoder = start_encoder(job['path'], job['fps'], width, height, job['draft'])
+    pipeline = FramePipeline(encoder, width, height, depth=job['queue_depth']).start()
+    skipper = FrameSkipper()
+    last_progress = time.time()
+    for frame in range(job['start'], job['end']):
+        if job['progress'] is not None and time.time() - last_progress >= PROGRESS_INTERVAL:
+            # Send what was counted so far, the parent exports it while the chunk renders
+            job['progress'].put(metrics.drain())
+            last_progress = time.time()
+        t = frame_time(frame, job['fps'])
+        render_start = time.perf_counter()
+        q, show_answer, last_switch_time, question_time, game_state = scene_at(timeline, t, job['question_time'])
+        if not skipper.should_render(scene_signature(q, show_answer, last_switch_time, question_time, game_state,
+                                                     t, render_scale)):
+            pipeline.repeat()
+            metrics.inc('quiz_frames_skipped_total')
+            metrics.inc('quiz_frames_repeated_total')
+            continue
+        render_game(screen, q, show_answer, last_switch_time, question_time, game_state, now=t, play_sounds=False,
+                    render_scale=render_scale, draft=job['draft'])
+        render_time = time.perf_counter() - render_start
+        metrics.observe('quiz_frame_seconds', render_time)
+        metrics.inc('quiz_frames_rendered_total')
+        pipeline.submit(screen, render_time)
+    if pipeline.close() != 0:
+        raise Exception(f"ffmpeg failed to encode chunk {job['index']}")
+    return job['index'], time.time() - start_time, pipeline.stats()
+
+# NumPy sample type for each mixer size
+SAMPLE_TYPES = {8: np.uint8, -8: np.int8, 16: np.uint16, -16: np.int16, 32: np.float32}
+
+def sound_samples(sound):
+    """Samples of a sound as 16-bit range floats of shape (length, channels), scaled by its volume"""
+    _, size, channels = pygame.mixer.get_init()
+    samples = np.frombuffer(sound.get_raw(), dtype=SAMPLE_TYPES[size]).reshape(-1, channels).astype(np.float64)
+    if size == 8:
+        samples = (samples - 128) * 256
+    elif size == -8:
+        samples *= 256
+    elif size == 16:
+        samples -= 32768
+    elif size == 32:
+        samples *= 32767
+    return samples * sound.get_volume()
+
+def mix_audio(timeline, character, path):
+    """Mix the session sounds at their timeline positions into a 16-bit WAV file at the mixer's rate"""
+    # Use the format the mixer actually opened with, the sounds were converted to it
+    frequency, _, channels = pygame.mixer.get_init()
+    total_samples = video_duration(timeline) * frequency // 1000
+    mix = np.zeros((total_samples, channels), dtype=np.float64)
+
+    def find_sound(name):
+        if name.startswith('voice:'):
+            return character.voice_sounds.get(name[len('voice:'):]) if character else None
+        return common_sounds.sounds.get(name)
+
+    def add(name, start, end=None):
+        sound = find_sound(name)
+        if sound is None:
+            return
+        samples = sound_samples(sound)
+        begin = start * frequency // 1000
+        if end is None:
+            end_sample = min(total_samples, begin + len(samples))
+        else:
+            # Looping sound, repeated until it is stopped
+            end_sample = min(total_samples, end * frequency // 1000)
+            repeats = -(-(end_sample - begin) // len(samples)) if end_sample > begin else 0
+            samples = np.tile(samples, (max(repeats, 1), 1))
+        if end_sample > begin:
+            mix[begin:end_sample] += samples[:end_sample - begin]
+
+    add('voice:intro', 0)
+    for i, cue in enumerate(timeline.cues):
+        start = INTRO_DURATION + cue.time
+        if cue.action == 'play':
+            add(cue.sound, start)
+        elif cue.action == 'loop':
+            stop = next((c.time for c in timeline.cues[i + 1:] if c.action == 'stop' and c.sound == cue.sound),
+                        timeline.duration)
+            add(cue.sound, start, INTRO_DURATION + stop)
+    add('voice:outro', INTRO_DURATION + timeline.duration)
+
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(frequency)
+        f.writeframes(np.clip(mix, -32768, 32767).astype(np.int16).tobytes())
+
+# Audio encoding of the output. Drafts get a mono MP3 track, encoding AAC takes seconds for a whole session
+AUDIO_OPTIONS = ['-c:a', 'aac', '-b:a', '192k']
+DRAFT_AUDIO_OPTIONS = ['-c:a', 'libmp3lame', '-b:a', '64k', '-ac', '1', '-ar', '22050']
+FALLBACK_DRAFT_AUDIO_OPTIONS = ['-c:a', 'aac', '-b:a', '64k', '-ac', '1', '-ar', '22050']
+
+@functools.lru_cache(maxsize=None)
+def has_encoder(name):
+    """True if the installed ffmpeg was built with the given encoder"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True)
+    return any(line.split()[1:2] == [name] for line in result.stdout.splitlines())
+
+def audio_options(draft=False):
+    if not draft:
+        return AUDIO_OPTIONS
+    return DRAFT_AUDIO_OPTIONS if has_encoder('libmp3lame') else FALLBACK_DRAFT_AUDIO_OPTIONS
+
+def concat_segments(segment_paths, audio_path, output, work_dir, draft=False):
+    """Join the encoded segments without re-encoding and add the mixed audio"""
+    list_path = os.path.join(work_dir, 'segments.txt')
+    with open(list_path, 'w') as f:
+        for segment_path in segment_paths:
+            f.write(f"file '{os.path.abspath(segment_path)}'\n")
+    result = subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'concat', '-safe', '0', '-i', list_path, '-i', audio_path,
+        '-map', '0:v', '-map', '1:a', '-c:v', 'copy'
+    ] + audio_options(draft) + ['-movflags', '+faststart', output])
+    if result.returncode != 0:
+        raise Exception("ffmpeg failed to concatenate the segments")
+
+def report_chunk(index, seconds, stats):
+    print(f"Chunk {index} done: {stats['frames']} frames ({stats['skipped']} unchanged) in {seconds:.2f} seconds "
+          f"(render {stats['render_ms']:.1f} ms, copy {stats['copy_ms']:.1f} ms, "
+          f"encode {stats['encode_ms']:.1f} ms, blocked {stats['wait_ms']:.1f} ms per frame, "
+          f"queue depth avg {stats['avg_queue_depth']:.1f} max {stats['max_queue_depth']})")
+
+def merge_progress(progress):
+    """Merge the metrics sent by the workers until None is received (runs in a thread)"""
+    while True:
+        snapshot = progress.get()
+        if snapshot is None:
+            break
+        metrics.merge(snapshot)
+
+def render_session(logic, output, workers, seed, character_name=None, fps=RENDER_FPS,
+                   queue_depth=FRAME_QUEUE_DEPTH, draft=False, render_scale=1.0):
+    """Render the questions of logic to output, splitting the work across worker processes.
+    Drafts are rendered as one chunk in this process"""
+    start_time = time.time()
+    rng = random.Random(seed)
+    if character_name is None and character_manager.characters:
+        character_name = rng.choice(sorted(character_manager.characters))
+    poses = Character.list_poses(character_name) if character_name else []
+    pose = rng.choice(poses) if poses else None
+    print(f"Rendering session with character {character_name} (pose {pose}, seed {seed})")
+    if draft:
+        print(f"Draft render at {render_scale:.2f}x resolution and {fps} FPS")
+
+    timeline = logic.compile_timeline()
+    # Drafts render in this process: starting workers costs more than it saves on a preview
+    chunks = split_chunks(timeline, fps, 1 if draft else max(1, workers))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        print("Mixing audio...")
+        # Only the voice lines are needed here, the workers load the frames
+        character = Character(character_name, frame_states=()) if character_name else None
+        audio_path = os.path.join(work_dir, 'audio.wav')
+        mix_audio(timeline, character, audio_path)
+
+        progress = None
+        if not draft:
+            # Worker metrics are merged into this process as they come, the exporter runs here
+            manager = multiprocessing.get_context('spawn').Manager()
+            progress = manager.Queue()
+            merger = threading.Thread(target=merge_progress, args=(progress,), daemon=True)
+            merger.start()
+
+        jobs = []
+        for index, (start, end) in enumerate(chunks):
+            jobs.append({
+                'index': index,
+                'start': start,
+                'end': end,
+                'path': os.path.join(work_dir, f'segment_{index:03d}.mp4'),
+                'seed': seed,
+                'character': character_name,
+                'pose': pose,
+                'fps': fps,
+                'queue_depth': queue_depth,
+                'draft': draft,
+                'render_scale': render_scale,
+                'questions': list(timeline.questions),
+                'session_length': logic.session_length,
+                'question_time': logic.question_time,
+                'answer_time': logic.answer_time,
+                'progress': progress,
+            })
+
+        chunk_stats = []
+        if draft:
+            print("Rendering draft in this process...")
+            index, seconds, stats = render_frames(jobs[0])
+            report_chunk(index, seconds, stats)
+            chunk_stats.append(stats)
+        else:
+            print(f"Rendering {len(jobs)} chunks on {len(jobs)} workers...")
+            # Spawn instead of fork so every worker starts with a clean pygame state
+            with multiprocessing.get_context('spawn').Pool(len(jobs)) as pool:
+                for index, seconds, stats in pool.imap_unordered(render_chunk, jobs):
+                    report_chunk(index, seconds, stats)
+                    chunk_stats.append(stats)
+            # Workers put their last metrics before returning, so the end marker comes after them
+            progress.put(None)
+            merger.join()
+            manager.shutdown()
+        print(f"Frames: {sum(stats['frames'] for stats in chunk_stats)}, "
+              f"unchanged frames repeated without rendering: {sum(stats['skipped'] for stats in chunk_stats)}")
+
+        print("Concatenating segments...")
+        concat_segments([job['path'] for job in jobs], audio_path, output, work_dir, draft)
+
+    for q in timeline.questions:
+        logic.used_questions.add(q["qid"])
+    metrics.inc('quiz_videos_completed_total')
+    print(f"Session rendered to {output} in {time.time() - start_time:.2f} seconds")
+
+def main():
+    args = parse_args()
+    if shutil.which('ffmpeg') is None:
+        raise Exception("ffmpeg is required to render videos")
+
+    init_headless()
+    character_manager.initialize()
+    common_sounds.initialize()
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+
+    exporter = None
+    if args.metrics_file:
+        exporter = MetricsExporter(args.metrics_file, args.metrics_interval).start()
+
+    logic = GameLogic()
+    if args.draft:
+        render_session(logic, args.output, args.workers, seed, args.character, args.draft_fps,
+                       args.queue_depth, draft=True, render_scale=args.draft_scale)
+    else:
+        render_session(logic, args.output, args.workers, seed, args.character, args.fps, args.queue_depth)
+    logic.save_used()
+    if exporter:
+        exporter.stop()
+    pygame.quit()
+
+if __name__ == '__main__':
+    main()
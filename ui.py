@@ -1,11 +1,20 @@
 import pygame
 from config import WINDOW_WIDTH, WINDOW_HEIGHT, WHITE, BLACK, RED, FONT_SIZE, FONT_PATH
+import functools
 import math
 import cv2
 import numpy as np
 import os
 import random
+import threading
 import time
+import tempfile
+from audio_cache import LazySound, AudioCache
+from metrics import metrics
+
+# Sounds decoded at startup, everything else is decoded when first played
+EAGER_COMMON_SOUNDS = {'timer'}
+EAGER_VOICE_SOUNDS = {'intro'}
 
 # Modern color palette
 BACKGROUND = (245, 247, 250)  # Light gray background
@@ -17,9 +26,18 @@ DANGER_COLOR = (239, 68, 68)  # Red
 TEXT_COLOR = (31, 41, 55)  # Dark gray
 LIGHT_TEXT = (107, 114, 128)  # Light gray
 SHADOW_COLOR = (0, 0, 0, 30)  # Semi-transparent black
+CHEAP_SHADOW_COLOR = (225, 225, 225)  # SHADOW_COLOR blended over white
 TIMER_COLOR = (168, 85, 247)  # Purple for timer
 HOVER_COLOR = (243, 244, 246)  # Light hover effect
 
+# Downscaled video frames of draft renders are stored here, so drafts do not decode the videos again
+FRAME_CACHE_DIR = '.frame_cache'
+
+# Game states in which the character is drawn
+CHARACTER_STATES = ('intro', 'bye', 'thinking', 'correct')
+# Frame sets a Character can load, used by the intro, bye and question/answer states
+FRAME_STATES = ('intro', 'outro', 'pose')
+
 # Animation constants
 ANIMATION_DURATION = 500  # milliseconds
 EASING_FUNCTION = lambda x: 1 - math.pow(1 - x, 3)  # Cubic ease-out
@@ -44,9 +62,10 @@ class CommonSounds:
                 if sound_file.endswith('.mp3'):
                     sound_name = os.path.splitext(sound_file)[0]
                     sound_path = os.path.join(common_sounds_dir, sound_file)
-                    print(f"Loading common sound: {sound_name}")
-                    self.sounds[sound_name] = pygame.mixer.Sound(sound_path)
-                    self.sounds[sound_name].set_volume(0.5)
+                    self.sounds[sound_name] = LazySound(sound_path, volume=0.5)
+                    if sound_name in EAGER_COMMON_SOUNDS:
+                        print(f"Loading common sound: {sound_name}")
+                        self.sounds[sound_name].load()
     
     def play(self, sound_name):
         """Play a common sound"""
@@ -62,9 +81,17 @@ class CommonSounds:
 common_sounds = CommonSounds()
 
 class Character:
-    def __init__(self, name):
+    def __init__(self, name, pose=None, frame_states=FRAME_STATES, load_voices=True, frame_scale=1.0,
+                 frame_filter=None):
         print(f"Initializing character: {name}")
         self.name = name
+        self.pose = pose  # Pose video to use, a random one is picked if None
+        self.frame_states = frame_states  # Which of 'intro', 'outro' and 'pose' frames to decode
+        self.load_voices = load_voices  # False when nothing will be played, e.g. in render workers
+        self.frame_scale = frame_scale  # Below 1.0 to keep smaller frames for draft renders
+        # Optional frame_filter(frame_state, frame_count) returning the video frame indices that will be drawn,
+        # the other frames are skipped without being converted and left as None
+        self.frame_filter = frame_filter
         # Video frames or images for different states
         self.intro_frames = None
         self.outro_frames = None
@@ -89,67 +116,69 @@ class Character:
         if self.uses_videos:
             print("Loading video resources...")
             # Load intro video
-            print("Loading intro video...")
             intro_path = os.path.join(video_dir, 'intro.mp4')
-            if os.path.exists(intro_path):
-                self.intro_frames = self.load_video(intro_path)
+            if 'intro' in self.frame_states and os.path.exists(intro_path):
+                print("Loading intro video...")
+                self.intro_frames = self.load_video(intro_path, self.frame_scale, self.frames_to_keep('intro'))
                 print(f"Intro video loaded: {len(self.intro_frames)} frames")
             
             # Load outro video
-            print("Loading outro video...")
             outro_path = os.path.join(video_dir, 'outro.mp4')
-            if os.path.exists(outro_path):
-                self.outro_frames = self.load_video(outro_path)
+            if 'outro' in self.frame_states and os.path.exists(outro_path):
+                print("Loading outro video...")
+                self.outro_frames = self.load_video(outro_path, self.frame_scale, self.frames_to_keep('outro'))
                 print(f"Outro video loaded: {len(self.outro_frames)} frames")
             
             # Select and load a random pose video
-            print("Loading pose video...")
-            pose_files = [f for f in os.listdir(video_dir) if f.startswith('pose') and f.endswith('.mp4')]
+            pose_files = self.list_poses(self.name)
             if pose_files:
-                selected_pose = random.choice(pose_files)
+                selected_pose = self.pose if self.pose in pose_files else random.choice(pose_files)
                 self.selected_pose = selected_pose
+            if 'pose' in self.frame_states and pose_files:
+                print("Loading pose video...")
                 pose_path = os.path.join(video_dir, selected_pose)
-                self.pose_frames = self.load_video(pose_path)
+                self.pose_frames = self.load_video(pose_path, self.frame_scale, self.frames_to_keep('pose'))
                 print(f"Pose video loaded: {len(self.pose_frames)} frames")
         
         elif self.uses_images:
             print("Loading image resources...")
             # Load intro image
-            print("Loading intro image...")
             intro_path = os.path.join(image_dir, 'intro.png')
-            if os.path.exists(intro_path):
-                self.intro_frames = [pygame.image.load(intro_path)]
+            if 'intro' in self.frame_states and os.path.exists(intro_path):
+                print("Loading intro image...")
+                self.intro_frames = [self.load_image(intro_path)]
                 print("Intro image loaded")
             
             # Load outro image
-            print("Loading outro image...")
             outro_path = os.path.join(image_dir, 'outro.png')
-            if os.path.exists(outro_path):
-                self.outro_frames = [pygame.image.load(outro_path)]
+            if 'outro' in self.frame_states and os.path.exists(outro_path):
+                print("Loading outro image...")
+                self.outro_frames = [self.load_image(outro_path)]
                 print("Outro image loaded")
             
             # Load question and answer images
-            print("Loading pose images...")
             question_path = os.path.join(image_dir, 'question.png')
             answer_path = os.path.join(image_dir, 'answer.png')
-            if os.path.exists(question_path) and os.path.exists(answer_path):
+            if 'pose' in self.frame_states and os.path.exists(question_path) and os.path.exists(answer_path):
+                print("Loading pose images...")
                 self.pose_frames = [
-                    pygame.image.load(question_path),  # First frame for question
-                    pygame.image.load(answer_path)     # Second frame for answer
+                    self.load_image(question_path),  # First frame for question
+                    self.load_image(answer_path)     # Second frame for answer
                 ]
                 print("Pose images loaded")
         
         # Load character-specific voice sounds
-        print("Loading voice sounds...")
         voice_dir = f'characters/{self.name}/voice'
-        if os.path.exists(voice_dir):
+        if self.load_voices and os.path.exists(voice_dir):
+            print("Loading voice sounds...")
             for sound_file in os.listdir(voice_dir):
                 if sound_file.endswith('.mp3'):
                     sound_name = os.path.splitext(sound_file)[0]
                     sound_path = os.path.join(voice_dir, sound_file)
-                    self.voice_sounds[sound_name] = pygame.mixer.Sound(sound_path)
-                    self.voice_sounds[sound_name].set_volume(0.5)
-                    print(f"Loaded sound: {sound_name}")
+                    self.voice_sounds[sound_name] = LazySound(sound_path, volume=0.5)
+                    if sound_name in EAGER_VOICE_SOUNDS:
+                        self.voice_sounds[sound_name].load()
+                        print(f"Loaded sound: {sound_name}")
         
         end_time = time.time()
         print(f"Character resources loaded in {end_time - start_time:.2f} seconds")
@@ -161,25 +190,132 @@ class Character:
         elif state == 'bye':
             return self.outro_frames
         else:  # 'thinking' or 'correct'
-            if self.uses_images:
+            if self.uses_images and self.pose_frames:
                 # For images, return question image for 'thinking' and answer image for 'correct'
                 return [self.pose_frames[0]] if state == 'thinking' else [self.pose_frames[1]]
             return self.pose_frames
     
+    def unload_sounds(self):
+        """Release the decoded voice lines, e.g. when the character leaves the pool"""
+        for sound in self.voice_sounds.values():
+            sound.unload()
+    
+    def resident_bytes(self):
+        """Estimate of the memory held by the decoded frames and loaded voice lines.
+        Voice lines shared with other characters are counted for each of them"""
+        total = 0
+        for frames in (self.intro_frames, self.outro_frames, self.pose_frames):
+            for frame in frames or []:
+                if frame is None:
+                    continue
+                total += frame.get_width() * frame.get_height() * frame.get_bytesize()
+        mixer = pygame.mixer.get_init()
+        if mixer:
+            frequency, size, channels = mixer
+            for sound in self.voice_sounds.values():
+                # Read the loaded Sound once, the character may be unloaded meanwhile and metrics must never load audio
+                loaded = sound.sound
+                if loaded is not None:
+                    total += int(loaded.get_length() * frequency) * channels * abs(size) // 8
+        return total
+    
     @staticmethod
-    def load_video(video_path):
-        """Load video and convert frames to pygame surfaces"""
+    def list_poses(name):
+        """List the pose videos available for a character"""
+        video_dir = f'characters/{name}/video'
+        if not os.path.exists(video_dir):
+            return []
+        return sorted(f for f in os.listdir(video_dir) if f.startswith('pose') and f.endswith('.mp4'))
+    
+    def frames_to_keep(self, frame_state):
+        if self.frame_filter is None:
+            return None
+        return lambda frame_count: self.frame_filter(frame_state, frame_count)
+    
+    def load_image(self, image_path):
+        """Load an image, scaled down by frame_scale"""
+        image = pygame.image.load(image_path)
+        if self.frame_scale != 1.0:
+            new_size = (int(image.get_width() * self.frame_scale), int(image.get_height() * self.frame_scale))
+            image = pygame.transform.smoothscale(image, new_size)
+        return image
+    
+    @staticmethod
+    def load_video(video_path, scale=1.0, keep=None):
+        """Load video and convert frames to pygame surfaces.
+        keep(frame_count) may return the indices to load, other frames are grabbed but not decoded and stay None"""
         print(f"Loading video: {video_path}")
         start_time = time.time()
+        if scale != 1.0:
+            # Downscaled frames come from the frame cache, only the kept ones are made into surfaces
+            cached = Character.cached_video_frames(video_path, scale)
+            kept = keep(len(cached)) if keep else None
+            frames = [pygame.surfarray.make_surface(frame) if kept is None or i in kept else None
+                      for i, frame in enumerate(cached)]
+            print(f"Video loaded in {time.time() - start_time:.2f} seconds")
+            return frames
+        cap = cv2.VideoCapture(video_path)
+        reported_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        frames = Character.read_video(video_path, scale, keep(reported_count) if keep else None)
+        if keep and len(frames) != reported_count:
+            # The container count is only an estimate for some files, and the frames drawn depend on the real one
+            print(f"Error: {video_path} reports {reported_count} frames but has {len(frames)}, loading it again")
+            frames = Character.read_video(video_path, scale, keep(len(frames)))
+        end_time = time.time()
+        print(f"Video loaded in {end_time - start_time:.2f} seconds")
+        return frames
+    
+    @staticmethod
+    def cached_video_frames(video_path, scale):
+        """Every frame of a video scaled down, as an array in surfarray layout read from FRAME_CACHE_DIR.
+        The video is decoded and the cache written the first time"""
+        cache_path = os.path.join(FRAME_CACHE_DIR, f"{AudioCache.content_hash(video_path)}_{scale}.npy")
+        if os.path.exists(cache_path):
+            metrics.inc('quiz_asset_cache_hits_total', labels={'cache': 'frames'})
+            # Memory mapped, the frames that are not kept are never read
+            return np.load(cache_path, mmap_mode='r')
+        metrics.inc('quiz_asset_cache_misses_total', labels={'cache': 'frames'})
         cap = cv2.VideoCapture(video_path)
         frames = []
-        frame_count = 0
         while cap.isOpened():
             ret, frame = cap.read()
+            if not ret:
+                break
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            frames.append(np.rot90(frame))
+        cap.release()
+        if not frames:
+            return frames
+        frames = np.stack(frames)
+        os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so a partial write is never picked up
+        fd, tmp_path = tempfile.mkstemp(dir=FRAME_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, frames)
+        os.replace(tmp_path, cache_path)
+        return frames
+    
+    @staticmethod
+    def read_video(video_path, scale=1.0, kept=None):
+        """Read every frame of a video, only converting those in kept (all if None)"""
+        cap = cv2.VideoCapture(video_path)
+        frames = []
+        frame_count = 0
+        while cap.isOpened():
+            if not cap.grab():
+                break
+            if kept is not None and len(frames) not in kept:
+                frames.append(None)
+                continue
+            ret, frame = cap.retrieve()
             if not ret:
                 break
             # Convert BGR to RGB
             frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
             # Convert to pygame surface
             frame = np.rot90(frame)
             frame = pygame.surfarray.make_surface(frame)
@@ -188,15 +324,19 @@ class Character:
             if frame_count % 30 == 0:  # Log every 30 frames
                 print(f"Loaded {frame_count} frames...")
         cap.release()
-        end_time = time.time()
-        print(f"Video loaded in {end_time - start_time:.2f} seconds")
         return frames
 
 class CharacterManager:
-    def __init__(self):
-        self.characters = {}  # Will store character names only
+    def __init__(self, max_warm=2):
+        self.characters = {}  # Character names, mapped to the loaded Character while it is warm
         self.current_character = None
         self.current_video_frames = None
+        self.max_warm = max_warm  # How many loaded characters the pool keeps resident, the current one included
+        self.last_used = {}  # name -> time the character was last activated, for eviction
+        self.preload_thread = None
+        self.preload_name = None
+        self.pool_hits = 0
+        self.pool_misses = 0
     
     def initialize(self):
         """Initialize the character manager after pygame mixer is initialized"""
@@ -213,11 +353,76 @@ class CharacterManager:
         """Select a random character for the session and load its resources"""
         if self.characters:
             char_name = random.choice(list(self.characters.keys()))
-            # Create and load the selected character
-            self.current_character = Character(char_name)
-            return self.current_character
+            return self.activate(char_name)
         return None
     
+    def warm_count(self):
+        """Number of characters currently loaded in the pool"""
+        return sum(1 for character in self.characters.values() if character is not None)
+    
+    def _load_into_pool(self, char_name):
+        self.characters[char_name] = Character(char_name)
+    
+    def preload_character(self, char_name=None):
+        """Start loading a character in the background so the next session can switch instantly"""
+        if not self.characters:
+            return None
+        if char_name is None:
+            char_name = random.choice(list(self.characters.keys()))
+        self.wait_for_preload()
+        self.preload_name = char_name
+        if self.characters[char_name] is None:
+            self.evict(keep={char_name})
+            self.preload_thread = threading.Thread(target=self._load_into_pool, args=(char_name,), daemon=True)
+            self.preload_thread.start()
+        return char_name
+    
+    def preload_ready(self):
+        """True once no background load is running, so activate() will not block on it"""
+        return self.preload_thread is None or not self.preload_thread.is_alive()
+    
+    def wait_for_preload(self):
+        if self.preload_thread is not None:
+            self.preload_thread.join()
+            self.preload_thread = None
+    
+    def evict(self, keep=()):
+        """Unload least recently used characters until there is room for one more"""
+        keep = set(keep)
+        if self.current_character:
+            keep.add(self.current_character.name)
+        warm = [name for name, character in self.characters.items()
+                if character is not None and name not in keep]
+        warm.sort(key=lambda name: self.last_used.get(name, 0))
+        while warm and self.warm_count() >= self.max_warm:
+            name = warm.pop(0)
+            print(f"Evicting character from pool: {name}")
+            self.characters[name].unload_sounds()
+            self.characters[name] = None
+    
+    def activate(self, char_name):
+        """Make a character current, loading it now if it is not warm"""
+        if char_name == self.preload_name:
+            self.wait_for_preload()
+            self.preload_name = None
+        if self.characters.get(char_name) is not None:
+            self.pool_hits += 1
+            metrics.inc('quiz_asset_cache_hits_total', labels={'cache': 'character_pool'})
+        else:
+            self.pool_misses += 1
+            metrics.inc('quiz_asset_cache_misses_total', labels={'cache': 'character_pool'})
+            self.evict(keep={char_name})
+            self._load_into_pool(char_name)
+        self.current_character = self.characters[char_name]
+        self.last_used[char_name] = time.time()
+        return self.current_character
+    
+    def collect_metrics(self, registry):
+        """Report the memory held by each character, 0 once it was evicted"""
+        for name, character in list(self.characters.items()):
+            resident = character.resident_bytes() if character is not None else 0
+            registry.set('quiz_character_resident_bytes', resident, labels={'character': name})
+    
     def select_random_video(self):
         """Select a random video for the current question"""
         if self.current_character:
@@ -238,12 +443,16 @@ def draw_rounded_rect(surface, color, rect, radius=15):
     """Draw a rounded rectangle"""
     pygame.draw.rect(surface, color, rect, border_radius=radius)
 
-def draw_shadow(surface, rect, offset=3, blur=6):
+def draw_shadow(surface, rect, offset=3, blur=6, radius=15, cheap=False):
     """Draw a subtle shadow behind a rectangle"""
     shadow_rect = pygame.Rect(rect.x + offset, rect.y + offset, rect.width, rect.height)
+    if cheap:
+        # Opaque approximation of the shadow, avoids allocating and blending an alpha surface
+        pygame.draw.rect(surface, CHEAP_SHADOW_COLOR, shadow_rect, border_radius=radius)
+        return
     shadow_surface = pygame.Surface((rect.width + blur * 2, rect.height + blur * 2), pygame.SRCALPHA)
     pygame.draw.rect(shadow_surface, SHADOW_COLOR, 
-                    (blur, blur, rect.width, rect.height), border_radius=15)
+                    (blur, blur, rect.width, rect.height), border_radius=radius)
     surface.blit(shadow_surface, (shadow_rect.x - blur, shadow_rect.y - blur))
 
 def create_gradient_surface(width, height, color1, color2, vertical=True):
@@ -274,37 +483,71 @@ def wrap_text(text, font, max_width):
         lines.append(current_line)
     return lines
 
-def prepare_question_render(q, FONT):
+def scaled(value, render_scale=1.0):
+    """Scale a layout size given for the full size window, rounding halves up"""
+    return int(value * render_scale + 0.5)
+
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    """Fonts are loaded from FONT_PATH once per size"""
+    return pygame.font.Font(FONT_PATH, size)
+
+@functools.lru_cache(maxsize=1024)
+def render_text(font, text, color):
+    """Rendered text is reused across frames, it only changes when the question or an animation does.
+    The returned surface is shared and must only be blitted"""
+    return font.render(text, True, color)
+
+@functools.lru_cache(maxsize=1024)
+def wrap_text_cached(text, font, max_width):
+    return tuple(wrap_text(text, font, max_width))
+
+@functools.lru_cache(maxsize=256)
+def question_layout(question, choices):
+    """Wrapped lines and card rects of a question at full window size.
+    Drafts scale this layout instead of wrapping again with the smaller font, so their lines and cards match"""
+    font = get_font(FONT_SIZE)
     question_max_width = WINDOW_WIDTH - 100
-    question_lines = wrap_text(q["question"], FONT, question_max_width)
-    question_surfaces = [FONT.render(line, True, TEXT_COLOR) for line in question_lines]
-    line_height = question_surfaces[0].get_height() if question_surfaces else FONT_SIZE
+    question_lines = wrap_text_cached(question, font, question_max_width)
+    line_height = font.size(question_lines[0])[1] if question_lines else FONT_SIZE
     question_rect_width = question_max_width + 60
-    question_rect_height = len(question_surfaces) * line_height + 70
+    question_rect_height = len(question_lines) * line_height + 70
     question_rect_x = (WINDOW_WIDTH - question_rect_width) // 2
     question_rect_y = 150
     question_rect = pygame.Rect(question_rect_x, question_rect_y, question_rect_width, question_rect_height)
 
     # Prepare choices with better spacing and design
     choice_max_width = WINDOW_WIDTH - 120
-    choice_surfaces = []
+    choice_lines = []
     choice_rects = []
     choice_heights = []
     choice_spacing = 20
     start_y = question_rect.bottom + 30
-    for i, choice in enumerate(q["choices"]):
-        lines = wrap_text(choice, FONT, choice_max_width)
-        surfaces = [FONT.render(line, True, TEXT_COLOR) for line in lines]
-        ch = surfaces[0].get_height() if surfaces else FONT_SIZE
-        rect_height = len(surfaces) * ch + 40
+    for i, choice in enumerate(choices):
+        lines = wrap_text_cached(choice, font, choice_max_width)
+        ch = font.size(lines[0])[1] if lines else FONT_SIZE
+        rect_height = len(lines) * ch + 40
         rect_width = choice_max_width + 50
         rect_x = (WINDOW_WIDTH - rect_width) // 2
         rect_y = start_y + sum(choice_heights) + i * choice_spacing
-        rect = pygame.Rect(rect_x, rect_y, rect_width, rect_height)
-        choice_surfaces.append(surfaces)
-        choice_rects.append(rect)
+        choice_lines.append(lines)
+        choice_rects.append(pygame.Rect(rect_x, rect_y, rect_width, rect_height))
         choice_heights.append(rect_height)
-    return question_surfaces, question_rect, line_height, choice_surfaces, choice_rects
+    return question_lines, question_rect, line_height, tuple(choice_lines), tuple(choice_rects)
+
+def scaled_rect(rect, render_scale=1.0):
+    """Scale a rect of the full size layout"""
+    return pygame.Rect(scaled(rect.x, render_scale), scaled(rect.y, render_scale),
+                       scaled(rect.width, render_scale), scaled(rect.height, render_scale))
+
+def prepare_question_render(q, FONT, render_scale=1.0):
+    """Surfaces and rects of the question and choice cards, the lines are drawn with FONT"""
+    question_lines, question_rect, line_height, choice_lines, choice_rects = question_layout(q["question"],
+                                                                                            tuple(q["choices"]))
+    question_surfaces = [render_text(FONT, line, TEXT_COLOR) for line in question_lines]
+    choice_surfaces = [[render_text(FONT, line, TEXT_COLOR) for line in lines] for lines in choice_lines]
+    return (question_surfaces, scaled_rect(question_rect, render_scale), scaled(line_height, render_scale),
+            choice_surfaces, [scaled_rect(rect, render_scale) for rect in choice_rects])
 
 def lerp_color(color1, color2, t):
     """Linear interpolation between two colors"""
@@ -316,36 +559,46 @@ def get_animation_progress(start_time, current_time):
     progress = min(elapsed / ANIMATION_DURATION, 1.0)
     return EASING_FUNCTION(progress)
 
-def draw_character(screen, x, y, scale=0.5, question_start_time=None, game_state='thinking'):
-    """Draw the video frame or image centered at the given position"""
+def character_frame_index(question_start_time, game_state, now):
+    """Index of the character frame drawn at now, or None if no frame is drawn"""
     if question_start_time is None or not character_manager.current_character:
-        return
-        
-    current_time = pygame.time.get_ticks()
-    elapsed = current_time - question_start_time
+        return None
+    elapsed = now - question_start_time
     
     # Get appropriate frames based on game state
     frames = character_manager.current_character.get_frames_for_state(game_state)
+    if not frames:
+        return None
     
-    if frames:
-        if character_manager.current_character.uses_videos:
-            if game_state in ['thinking', 'correct']:
-                # For question/answer states, calculate frame based on elapsed time
-                if elapsed < QUESTION_DURATION + ANSWER_DURATION:
-                    frame_index = int((elapsed / (QUESTION_DURATION + ANSWER_DURATION)) * len(frames))
-                    frame_index = min(frame_index, len(frames) - 1)
-                    frame = frames[frame_index]
-                else:
-                    return
-            else:
-                # For intro/outro, play the entire video
-                frame_index = int((elapsed / 1000) * 30)  # Assuming 30 FPS
-                if frame_index >= len(frames):
-                    return
-                frame = frames[frame_index]
-        else:
-            # For images, just use the first (and only) frame
-            frame = frames[0]
+    if not character_manager.current_character.uses_videos:
+        # For images, just use the first (and only) frame
+        return 0
+    frame_index = video_frame_index(game_state, elapsed, len(frames))
+    if frame_index is None or frames[frame_index] is None:
+        return None
+    return frame_index
+
+def video_frame_index(game_state, elapsed, frame_count):
+    """Index of the video frame shown elapsed milliseconds into a state, or None once the video is over"""
+    if game_state in ['thinking', 'correct']:
+        # For question/answer states, calculate frame based on elapsed time
+        if elapsed < QUESTION_DURATION + ANSWER_DURATION:
+            frame_index = int((elapsed / (QUESTION_DURATION + ANSWER_DURATION)) * frame_count)
+            return min(frame_index, frame_count - 1)
+        return None
+    # For intro/outro, play the entire video
+    frame_index = int((elapsed / 1000) * 30)  # Assuming 30 FPS
+    if frame_index >= frame_count:
+        return None
+    return frame_index
+
+def draw_character(screen, x, y, scale=0.5, question_start_time=None, game_state='thinking', now=None):
+    """Draw the video frame or image centered at the given position"""
+    current_time = pygame.time.get_ticks() if now is None else now
+    frame_index = character_frame_index(question_start_time, game_state, current_time)
+    
+    if frame_index is not None:
+        frame = character_manager.current_character.get_frames_for_state(game_state)[frame_index]
         
         # Scale the frame if needed
         if scale != 1.0:
@@ -355,51 +608,102 @@ def draw_character(screen, x, y, scale=0.5, question_start_time=None, game_state
         rect = frame.get_rect(center=(x, y))
         screen.blit(frame, rect)
 
-def render_game(screen, current, show_answer, last_switch_time, question_time, game_state='thinking'):
-    FONT = pygame.font.Font(FONT_PATH, FONT_SIZE)
-    TITLE_FONT = pygame.font.Font(FONT_PATH, 32)
-    DIFF_FONT = pygame.font.Font(FONT_PATH, 24)
+def scene_signature(current, show_answer, last_switch_time, question_time, game_state='thinking',
+                    now=None, render_scale=1.0):
+    """Everything render_game output depends on, two frames with equal signatures are identical"""
+    if now is None:
+        now = pygame.time.get_ticks()
+    character = character_manager.current_character
+    frame_index = character_frame_index(last_switch_time, game_state, now) if game_state in CHARACTER_STATES else None
+    signature = [game_state, character.name if character else None, frame_index]
+    if current:
+        signature += [current.get("qid", current["question"]), show_answer]
+        if show_answer:
+            signature.append(get_animation_progress(last_switch_time, now))
+        else:
+            # Timer bar width and the displayed countdown second
+            elapsed = now - last_switch_time
+            progress = max(0, 1 - elapsed / question_time)
+            signature.append(int(progress * (scaled(WINDOW_WIDTH, render_scale) - scaled(40, render_scale))))
+            signature.append(max(0, question_time - elapsed) // 1000)
+    return tuple(signature)
+
+class FrameSkipper:
+    """Skip drawing frames whose scene signature did not change since the last drawn frame"""
+    def __init__(self):
+        self.last_signature = None
+        self.rendered = 0
+        self.skipped = 0
+    
+    def should_render(self, signature):
+        if signature == self.last_signature:
+            self.skipped += 1
+            return False
+        self.last_signature = signature
+        self.rendered += 1
+        return True
+    
+    def reset(self):
+        """Force the next frame to be drawn, e.g. after the screen was changed elsewhere"""
+        self.last_signature = None
+
+def render_game(screen, current, show_answer, last_switch_time, question_time, game_state='thinking',
+                now=None, play_sounds=True, render_scale=1.0, draft=False):
+    """Draw one frame. now defaults to the pygame clock, offline renders pass the frame time instead.
+    render_scale draws the layout on a smaller screen, draft also uses cheaper shadows"""
+    if now is None:
+        now = pygame.time.get_ticks()
+    S = render_scale
+    width = scaled(WINDOW_WIDTH, S)
+    height = scaled(WINDOW_HEIGHT, S)
+    FONT = get_font(scaled(FONT_SIZE, S))
+    TITLE_FONT = get_font(scaled(32, S))
+    DIFF_FONT = get_font(scaled(24, S))
+    SMALL_FONT = get_font(scaled(16, S))
+    
+    def shadow(rect):
+        draw_shadow(screen, rect, offset=scaled(3, S), blur=scaled(6, S), radius=scaled(15, S), cheap=draft)
     
     # Fill with white background
     screen.fill(WHITE)
     
     # Draw character based on game state
     if game_state == 'intro':
-        draw_character(screen, WINDOW_WIDTH // 2, WINDOW_HEIGHT - 150, scale=0.5, 
-                      question_start_time=last_switch_time, game_state='intro')
+        draw_character(screen, width // 2, height - scaled(150, S), scale=0.5, 
+                      question_start_time=last_switch_time, game_state='intro', now=now)
     elif game_state == 'bye':
-        draw_character(screen, WINDOW_WIDTH // 2, WINDOW_HEIGHT - 150, scale=0.5, 
-                      question_start_time=last_switch_time, game_state='bye')
+        draw_character(screen, width // 2, height - scaled(150, S), scale=0.5, 
+                      question_start_time=last_switch_time, game_state='bye', now=now)
     elif game_state in ['thinking', 'correct']:
-        draw_character(screen, WINDOW_WIDTH // 2, WINDOW_HEIGHT - 100, scale=0.3, 
-                      question_start_time=last_switch_time, game_state=game_state)
+        draw_character(screen, width // 2, height - scaled(100, S), scale=0.3, 
+                      question_start_time=last_switch_time, game_state=game_state, now=now)
     
     if not current:
         # Handle intro/outro states
         if game_state == 'intro':
-            title_surface = TITLE_FONT.render("Welcome to Quiz Master!", True, PRIMARY_COLOR)
-            title_rect = title_surface.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2))
+            title_surface = render_text(TITLE_FONT, "Welcome to Quiz Master!", PRIMARY_COLOR)
+            title_rect = title_surface.get_rect(center=(width // 2, height // 2))
             screen.blit(title_surface, title_rect)
         elif game_state == 'bye':
-            title_surface = TITLE_FONT.render("Thanks for playing!", True, PRIMARY_COLOR)
-            title_rect = title_surface.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2))
+            title_surface = render_text(TITLE_FONT, "Thanks for playing!", PRIMARY_COLOR)
+            title_rect = title_surface.get_rect(center=(width // 2, height // 2))
             screen.blit(title_surface, title_rect)
         return
     
     q, _, _ = current, show_answer, last_switch_time
-    question_surfaces, question_rect, line_height, choice_surfaces, choice_rects = prepare_question_render(q, FONT)
+    question_surfaces, question_rect, line_height, choice_surfaces, choice_rects = prepare_question_render(q, FONT, S)
     
     # Draw app title/header
-    title_surface = TITLE_FONT.render("Quiz Master", True, PRIMARY_COLOR)
-    title_rect = title_surface.get_rect(center=(WINDOW_WIDTH // 2, 40))
+    title_surface = render_text(TITLE_FONT, "Quiz Master", PRIMARY_COLOR)
+    title_rect = title_surface.get_rect(center=(width // 2, scaled(40, S)))
     screen.blit(title_surface, title_rect)
     
     # Draw difficulty badge with better styling
     diff_text = q["difficulty"].upper()
-    diff_surface = DIFF_FONT.render(diff_text, True, WHITE)
-    diff_bg_width = diff_surface.get_width() + 30
-    diff_bg_height = diff_surface.get_height() + 15
-    diff_bg_rect = pygame.Rect((WINDOW_WIDTH - diff_bg_width) // 2, 75, 
+    diff_surface = render_text(DIFF_FONT, diff_text, WHITE)
+    diff_bg_width = diff_surface.get_width() + scaled(30, S)
+    diff_bg_height = diff_surface.get_height() + scaled(15, S)
+    diff_bg_rect = pygame.Rect((width - diff_bg_width) // 2, scaled(75, S), 
                               diff_bg_width, diff_bg_height)
     
     # Choose color based on difficulty
@@ -410,36 +714,36 @@ def render_game(screen, current, show_answer, last_switch_time, question_time, g
     else:
         badge_color = DANGER_COLOR
     
-    draw_rounded_rect(screen, badge_color, diff_bg_rect, 20)
+    draw_rounded_rect(screen, badge_color, diff_bg_rect, scaled(20, S))
     diff_rect = diff_surface.get_rect(center=diff_bg_rect.center)
     screen.blit(diff_surface, diff_rect)
     
     # Draw question card with shadow
-    draw_shadow(screen, question_rect)
-    draw_rounded_rect(screen, CARD_COLOR, question_rect, 20)
+    shadow(question_rect)
+    draw_rounded_rect(screen, CARD_COLOR, question_rect, scaled(20, S))
     
     # Add question number indicator
     q_number = f"Question {q.get('number', '?')}"
-    q_num_surface = pygame.font.Font(FONT_PATH, 16).render(q_number, True, LIGHT_TEXT)
+    q_num_surface = render_text(SMALL_FONT, q_number, LIGHT_TEXT)
     q_num_rect = q_num_surface.get_rect()
-    q_num_rect.x = question_rect.x + 20
-    q_num_rect.y = question_rect.y + 15
+    q_num_rect.x = question_rect.x + scaled(20, S)
+    q_num_rect.y = question_rect.y + scaled(15, S)
     screen.blit(q_num_surface, q_num_rect)
     
     # Draw question text
     for i, surf in enumerate(question_surfaces):
         line_rect = surf.get_rect()
         line_rect.centerx = question_rect.centerx
-        line_rect.y = question_rect.y + 45 + i * line_height
+        line_rect.y = question_rect.y + scaled(45, S) + i * line_height
         screen.blit(surf, line_rect)
     
     # Get current time for animations
-    current_time = pygame.time.get_ticks()
+    current_time = now
     
     # Draw choice cards with modern styling and animations
     for i, rect in enumerate(choice_rects):
         # Draw shadow first
-        draw_shadow(screen, rect)
+        shadow(rect)
         
         # Calculate animation progress for this choice
         if show_answer and i == q["answer"]:
@@ -460,84 +764,80 @@ def render_game(screen, current, show_answer, last_switch_time, question_time, g
             )
             
             # Draw the animated background
-            draw_rounded_rect(screen, current_color, scaled_rect, 15)
+            draw_rounded_rect(screen, current_color, scaled_rect, scaled(15, S))
             
         else:
             # Normal choice - white with subtle border
-            draw_rounded_rect(screen, CARD_COLOR, rect, 15)
+            draw_rounded_rect(screen, CARD_COLOR, rect, scaled(15, S))
             if not show_answer:
-                pygame.draw.rect(screen, (229, 231, 235), rect, 2, border_radius=15)
+                pygame.draw.rect(screen, (229, 231, 235), rect, max(1, scaled(2, S)), border_radius=scaled(15, S))
         
         # Choice letter (A, B, C, D)
         choice_letter = chr(65 + i)  # A, B, C, D
-        letter_font = pygame.font.Font(FONT_PATH, 18)
+        letter_font = get_font(scaled(18, S))
         
         if show_answer and i == q["answer"]:
-            letter_surface = letter_font.render(choice_letter, True, WHITE)
+            letter_surface = render_text(letter_font, choice_letter, WHITE)
             letter_bg_color = lerp_color((237, 233, 254), (22, 163, 74), anim_progress)
         else:
-            letter_surface = letter_font.render(choice_letter, True, PRIMARY_COLOR)
+            letter_surface = render_text(letter_font, choice_letter, PRIMARY_COLOR)
             letter_bg_color = (237, 233, 254)
         
-        letter_bg_size = 30
-        letter_bg_rect = pygame.Rect(rect.x + 15, rect.y + (rect.height - letter_bg_size) // 2, letter_bg_size, letter_bg_size)
-        draw_rounded_rect(screen, letter_bg_color, letter_bg_rect, 15)
+        letter_bg_size = scaled(30, S)
+        letter_bg_rect = pygame.Rect(rect.x + scaled(15, S), rect.y + (rect.height - letter_bg_size) // 2, letter_bg_size, letter_bg_size)
+        draw_rounded_rect(screen, letter_bg_color, letter_bg_rect, scaled(15, S))
         
         letter_rect = letter_surface.get_rect(center=letter_bg_rect.center)
         screen.blit(letter_surface, letter_rect)
         
         # Draw choice text with animation
+        lines = question_layout(q["question"], tuple(q["choices"]))[3][i]
         for j, surf in enumerate(choice_surfaces[i]):
             if show_answer and i == q["answer"]:
                 # Animate text color
                 text_color = lerp_color(TEXT_COLOR, WHITE, anim_progress)
-                original_text = q["choices"][i]
-                lines = wrap_text(original_text, FONT, WINDOW_WIDTH - 120)
-                if j < len(lines):
-                    surf = FONT.render(lines[j], True, text_color)
-            else:
-                # Fix: Get the original text and re-render it
-                original_text = q["choices"][i]
-                lines = wrap_text(original_text, FONT, WINDOW_WIDTH - 120)
-                if j < len(lines):
-                    surf = FONT.render(lines[j], True, TEXT_COLOR)
+                surf = render_text(FONT, lines[j], text_color)
             
             line_rect = surf.get_rect()
-            line_rect.x = rect.x + 60  # Offset for the letter circle
-            line_rect.y = rect.y + 20 + j * surf.get_height()
+            line_rect.x = rect.x + scaled(60, S)  # Offset for the letter circle
+            line_rect.y = rect.y + scaled(20, S) + j * line_height
             screen.blit(surf, line_rect)
     
     # Draw modern timer bar (only during question, not answer)
-    now = pygame.time.get_ticks()
     elapsed = now - last_switch_time
     if not show_answer:
         progress = max(0, 1 - elapsed / question_time)
-        timer_width = int(progress * (WINDOW_WIDTH - 40))
+        timer_width = int(progress * (width - scaled(40, S)))
+        timer_y = height - scaled(40, S)
+        timer_height = scaled(8, S)
         
         # Timer background
-        timer_bg_rect = pygame.Rect(20, WINDOW_HEIGHT - 40, WINDOW_WIDTH - 40, 8)
-        draw_rounded_rect(screen, (229, 231, 235), timer_bg_rect, 4)
+        timer_bg_rect = pygame.Rect(scaled(20, S), timer_y, width - scaled(40, S), timer_height)
+        draw_rounded_rect(screen, (229, 231, 235), timer_bg_rect, scaled(4, S))
         
         # Timer progress with gradient
         if timer_width > 0:
-            timer_rect = pygame.Rect(20, WINDOW_HEIGHT - 40, timer_width, 8)
+            timer_rect = pygame.Rect(scaled(20, S), timer_y, timer_width, timer_height)
             if progress > 0.5:
                 color = SUCCESS_COLOR
             elif progress > 0.25:
                 color = (245, 158, 11)  # Orange
             else:
                 color = DANGER_COLOR
-            draw_rounded_rect(screen, color, timer_rect, 4)
+            draw_rounded_rect(screen, color, timer_rect, scaled(4, S))
         
         # Timer text
         time_left = max(0, question_time - elapsed) // 1000
         timer_text = f"{time_left}s"
-        timer_surface = pygame.font.Font(FONT_PATH, 16).render(timer_text, True, LIGHT_TEXT)
+        timer_surface = render_text(SMALL_FONT, timer_text, LIGHT_TEXT)
         timer_text_rect = timer_surface.get_rect()
-        timer_text_rect.centerx = WINDOW_WIDTH // 2
-        timer_text_rect.y = WINDOW_HEIGHT - 25
+        timer_text_rect.centerx = width // 2
+        timer_text_rect.y = height - scaled(25, S)
         screen.blit(timer_surface, timer_text_rect)
     
+    if not play_sounds:
+        return
+    
     # Control sounds
     if show_answer:
         if 'timer' in common_sounds.sounds: